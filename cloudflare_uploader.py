@@ -1,11 +1,183 @@
 import os
 import io
+import time
+import queue
+import asyncio
+import tempfile
+import functools
+import threading
+import concurrent.futures
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from PIL import Image
 import numpy as np
 import torch
 
+# Optional HTTP/2 transport: with httpx (and its h2 extra) installed, all
+# concurrent uploads multiplex over one TLS connection as parallel streams
+# instead of one TCP connection per worker. Falls back to the pooled
+# requests session otherwise.
+try:
+    import httpx
+    _HTTPX_CLIENT = httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+    )
+except ImportError:
+    _HTTPX_CLIENT = None
+
+# Optional streaming multipart: requests builds the whole multipart body as
+# one new bytes object before sending, a second full-payload copy. With
+# requests_toolbelt installed the body streams from the encoded buffer
+# instead.
+try:
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
+# Optional async transport: with aiohttp installed, uploads run on a single
+# event loop instead of a thread per upload, which scales to much larger
+# batches with lower memory. Encodes still run on executor threads so the
+# loop stays free.
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Optional fast JSON: orjson parses and serializes several times faster than
+# the stdlib, which matters once many responses land at once on the fan-in.
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+# Optional JIT quantizer: for CPU-resident float32 images, a numba kernel
+# fuses the scale/clamp/round/cast into one parallel pass with no
+# temporaries, specialized to the concrete shape on first call and cached
+# on disk across processes.
+try:
+    import numba
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _quantize(src, out):
+        h, w, c = src.shape
+        for y in numba.prange(h):
+            for x in range(w):
+                for ch in range(c):
+                    v = src[y, x, ch] * 255.0
+                    if v < 0.0:
+                        v = 0.0
+                    elif v > 255.0:
+                        v = 255.0
+                    out[y, x, ch] = numba.uint8(v + 0.5)
+except ImportError:
+    _quantize = None
+
+# Upper bound on concurrent uploads; network I/O overlaps across images so
+# wall-clock time is roughly max(single upload, total / workers).
+MAX_UPLOAD_WORKERS = 8
+
+# Transient statuses worth retrying: rate limiting and server-side errors.
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Retry budget shared by the sync and async transports.
+_RETRY_TOTAL = 5
+_RETRY_BACKOFF = 0.5
+
+# Shared session so the TCP+TLS connection to api.cloudflare.com is reused
+# across images and across repeated node invocations, instead of paying a
+# fresh handshake per upload. Transient server/rate-limit errors are retried
+# with backoff by urllib3; POST must be allowed explicitly since it is not
+# in urllib3's default retryable set.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=_RETRY_TOTAL,
+        backoff_factor=_RETRY_BACKOFF,
+        status_forcelist=list(_RETRY_STATUSES),
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+    ),
+))
+
+# Companion session for streaming (single-use) request bodies. Adapter-level
+# status retries would re-send an already-exhausted MultipartEncoder — zero
+# body bytes against the original Content-Length — so this adapter only
+# retries connection setup, where no body has been sent yet, and leaves
+# status handling (including Retry-After) to _post_with_retries.
+_STREAM_SESSION = requests.Session()
+_STREAM_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=_RETRY_TOTAL,
+        connect=_RETRY_TOTAL,
+        read=0,
+        backoff_factor=_RETRY_BACKOFF,
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=False,
+    ),
+))
+
+# Pillow's default PNG compression (zlib level 6) roughly doubles encode
+# CPU for ~10% smaller files versus level 1. Fast PNG is the default;
+# set CF_UPLOADER_FAST_PNG=0 to get the smaller, slower encode. For a
+# further encode speedup, pillow-simd is a drop-in replacement for Pillow
+# (pip install pillow-simd) and needs no changes here.
+_PNG_COMPRESS_LEVEL = 1 if os.environ.get("CF_UPLOADER_FAST_PNG", "1") != "0" else 6
+
+# Supported output encodings. JPEG/WebP are both far cheaper to encode and
+# far smaller on the wire than PNG for typical photographic diffusion
+# outputs; PNG remains available for lossless/alpha use cases.
+_FORMATS = {
+    "PNG": ("png", "image/png", {"format": "PNG", "compress_level": _PNG_COMPRESS_LEVEL}),
+    "JPEG": ("jpg", "image/jpeg", {"format": "JPEG", "quality": 92, "optimize": False}),
+    "WEBP": ("webp", "image/webp", {"format": "WEBP", "quality": 90, "method": 4}),
+}
+
+# Bounded pool of encode buffers shared by the worker threads, so a batch
+# does not allocate (and regrow) a fresh BytesIO per upload. Buffers are
+# never truncated — truncate(0) frees BytesIO's internal allocation — so a
+# pooled buffer keeps the capacity it grew to and steady-state encodes of
+# similar-sized images do no reallocation. Stale bytes past the write
+# position are never read because _encode slices the payload at tell().
+# Capped at workers+1 buffers so peak memory stays bounded.
+_BUF_POOL = queue.LifoQueue(maxsize=MAX_UPLOAD_WORKERS + 1)
+
+
+def _acquire_buf():
+    """
+    Check a rewound encode buffer out of the pool, creating one if the
+    pool is empty. Contents beyond the write position are stale.
+    """
+    try:
+        buf = _BUF_POOL.get_nowait()
+    except queue.Empty:
+        buf = io.BytesIO()
+    buf.seek(0)
+    return buf
+
+
+def _release_buf(buf):
+    """
+    Return a buffer to the pool; drop it if the pool is full. The buffer
+    is left untruncated on purpose so its capacity survives for reuse.
+    """
+    try:
+        _BUF_POOL.put_nowait(buf)
+    except queue.Full:
+        pass
+
 class CloudflareImageUploader:
     """
     ComfyUI node for uploading images directly to Cloudflare Images service.
@@ -20,6 +192,7 @@ class CloudflareImageUploader:
                 "account_id": ("STRING", {"default": os.environ.get("CF_ACCOUNT_ID", "")}),
                 "api_token": ("STRING", {"default": os.environ.get("CF_API_TOKEN", "")}),
                 "filename_prefix": ("STRING", {"default": "ComfyUI"}),
+                "format": (["JPEG", "WEBP", "PNG"], {"default": "JPEG"}),
             }
         }
     
@@ -29,79 +202,433 @@ class CloudflareImageUploader:
     OUTPUT_NODE = True
     CATEGORY = "image"
 
-    def upload_images(self, images, account_id, api_token, filename_prefix="ComfyUI"):
+    def upload_images(self, images, account_id, api_token, filename_prefix="ComfyUI", format="JPEG"):
         """
         Upload images directly to Cloudflare Images and return the image IDs.
         All operations are performed in memory without saving to disk.
-        
+
         Args:
             images: Tensor of images from ComfyUI
             account_id: Cloudflare account ID
             api_token: Cloudflare API token
             filename_prefix: Prefix for the filename shown in Cloudflare (not an actual file path)
-            
+            format: Output encoding, one of "PNG", "JPEG" or "WEBP"
+
         Returns:
             Tuple containing the original images and the Cloudflare image IDs
         """
+        # Fast-path degenerate inputs before any tensor or network work.
         if not account_id or not api_token:
             print("Warning: Cloudflare credentials not provided. Images will not be uploaded.")
             return (images, "")
-        
-        if images.shape[0] == 0:
+
+        if images is None or images.numel() == 0 or images.shape[0] == 0:
             print("Warning: No images received for upload.")
             return (images, "")
-        
-        cloudflare_ids = []
-        
-        for i in range(images.shape[0]):
-            try:
-                # Convert image tensor to PIL Image (in memory)
-                img = tensor2pil(images[i])
-                
-                # Convert PIL Image to bytes (in memory buffer)
-                img_bytes = io.BytesIO()
-                img.save(img_bytes, format='PNG')
-                img_bytes.seek(0)
-                
-                # Create a display filename (not an actual file path)
-                filename = f"{filename_prefix}_{i}.png"
-                
-                # Upload bytes directly to Cloudflare
-                url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/images/v1"
-                headers = {
-                    "Authorization": f"Bearer {api_token}"
-                }
-                files = {
-                    'file': (filename, img_bytes, 'image/png')
+
+        # Drop any autograd graph hanging off the batch; the slices taken
+        # below are views, so nothing is copied, but detaching lets earlier
+        # activations be freed while the uploads are in flight.
+        images = images.detach()
+
+        url, auth = _get_endpoint(account_id, api_token)
+        if _SESSION.headers.get("Authorization") != auth:
+            _SESSION.headers["Authorization"] = auth
+        if _STREAM_SESSION.headers.get("Authorization") != auth:
+            _STREAM_SESSION.headers["Authorization"] = auth
+        if _HTTPX_CLIENT is not None and _HTTPX_CLIENT.headers.get("Authorization") != auth:
+            _HTTPX_CLIENT.headers["Authorization"] = auth
+
+        # Upload all images concurrently; one slow or failing upload does not
+        # hold up the rest of the batch. With aiohttp installed the batch
+        # runs on one event loop; otherwise a thread per in-flight upload.
+        if aiohttp is not None:
+            results = asyncio.run(_upload_all(images, url, auth, filename_prefix, format))
+        else:
+            results = []
+            max_workers = min(images.shape[0], MAX_UPLOAD_WORKERS)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(_upload_one, i, images[i], url, filename_prefix, format): i
+                    for i in range(images.shape[0])
                 }
-                
-                response = requests.post(url, headers=headers, files=files)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get('success'):
-                        image_id = result['result']['id']
-                        cloudflare_ids.append(image_id)
-                        print(f"Uploaded image to Cloudflare, ID: {image_id}")
-                    else:
-                        errors = result.get('errors', [{'message': 'Unknown error'}])
-                        error_messages = [e.get('message', str(e)) for e in errors]
-                        print(f"Error uploading to Cloudflare: {', '.join(error_messages)}")
-                else:
-                    print(f"Upload failed with status {response.status_code}: {response.text}")
-            
-            except Exception as e:
-                print(f"Error uploading to Cloudflare: {str(e)}")
-        
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        image_id = future.result()
+                    except Exception as e:
+                        print(f"Error uploading to Cloudflare: {str(e)}")
+                        image_id = None
+                    if image_id is not None:
+                        results.append((futures[future], image_id))
+
+        # Restore the original batch order of the IDs, and record which
+        # indices never made it so downstream consumers can react.
+        results.sort()
+        cloudflare_ids = [image_id for _, image_id in results]
+        uploaded = {i for i, _ in results}
+        failed_indices = [i for i in range(images.shape[0]) if i not in uploaded]
+        if failed_indices:
+            print(f"Failed to upload image(s) at index: {failed_indices}")
+
         # Return format for ComfyUI's node execution system
         return {
             "ui": {
-                "cloudflare_ids": cloudflare_ids
+                "cloudflare_ids": cloudflare_ids,
+                "failed_indices": failed_indices
             },
-            "result": (images, json.dumps(cloudflare_ids) if len(cloudflare_ids) > 1 else cloudflare_ids[0] if cloudflare_ids else "")
+            "result": (images, _json_dumps(cloudflare_ids) if len(cloudflare_ids) > 1 else cloudflare_ids[0] if cloudflare_ids else "")
         }
 
 
+# Cap on encoded bytes held in RAM at once. A batch of dozens of 4K PNGs
+# can eat hundreds of MB of host memory while uploads drain, competing with
+# model weights on GPU hosts; beyond the budget, payloads spill to a temp
+# file and stream from disk instead.
+_MEM_BUDGET = int(os.environ.get("CF_UPLOADER_MEM_BUDGET", 512 * 1024 * 1024))
+
+_INFLIGHT_LOCK = threading.Lock()
+_INFLIGHT_BYTES = 0
+
+
+def _charge_payload(size):
+    """
+    Try to reserve size bytes of the in-flight memory budget.
+
+    Returns:
+        True if the payload may stay in RAM, False if it should spill
+    """
+    global _INFLIGHT_BYTES
+    with _INFLIGHT_LOCK:
+        if _INFLIGHT_BYTES + size > _MEM_BUDGET:
+            return False
+        _INFLIGHT_BYTES += size
+        return True
+
+
+def _discharge_payload(payload):
+    """
+    Release a payload produced by _encode: return its bytes to the budget,
+    or delete its spill file.
+    """
+    global _INFLIGHT_BYTES
+    if isinstance(payload, str):
+        try:
+            os.unlink(payload)
+        except OSError:
+            pass
+    else:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT_BYTES -= len(payload)
+
+
+def _encode(i, image, filename_prefix, format="JPEG"):
+    """
+    Encode a single image tensor into its on-the-wire form.
+
+    Pillow releases the GIL for the compression loop, so encodes running
+    on the upload threads already overlap with each other and with the
+    network I/O.
+
+    Args:
+        i: Index of the image within the batch
+        image: Image tensor slice from the batch
+        filename_prefix: Prefix for the display filename
+        format: Output encoding, one of "PNG", "JPEG" or "WEBP"
+
+    Returns:
+        (filename, payload, mime) tuple ready for the multipart upload;
+        payload is the encoded bytes, or the path of a spill file when the
+        in-flight memory budget is exhausted. Callers must pass the payload
+        to _discharge_payload once the upload is finished.
+    """
+    suffix, mime, save_kwargs = _FORMATS.get(format, _FORMATS["JPEG"])
+
+    # Convert image tensor to PIL Image (in memory)
+    img = tensor2pil(image)
+
+    # JPEG has no alpha channel support
+    if save_kwargs["format"] == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Encode into a pooled buffer and hand the transport the raw bytes,
+    # skipping the BytesIO re-read inside its multipart encoder. When the
+    # in-flight budget is spent, spill to disk and pass the path instead.
+    # The buffer always goes back to the pool, even if the encode raises.
+    buf = _acquire_buf()
+    try:
+        img.save(buf, **save_kwargs)
+        # Slice at the write position: the pooled buffer may be larger than
+        # this encode and carry stale bytes from a previous image.
+        size = buf.tell()
+        if _charge_payload(size):
+            payload = buf.getbuffer()[:size].tobytes()
+        else:
+            tmp = tempfile.NamedTemporaryFile(
+                prefix="cf_upload_", suffix=f".{suffix}", delete=False)
+            try:
+                tmp.write(buf.getbuffer()[:size])
+            finally:
+                tmp.close()
+            payload = tmp.name
+    finally:
+        _release_buf(buf)
+
+    # Create a display filename (not an actual file path)
+    filename = f"{filename_prefix}_{i}.{suffix}"
+    return filename, payload, mime
+
+
+# Reusable multipart field container per thread. requests consumes the
+# mapping synchronously inside post() (and explicitly accepts a list in
+# place of the field tuple) without retaining it, so one dict and one inner
+# list can be recycled across every upload a thread performs instead of
+# allocating fresh ones per image.
+_FILES_LOCAL = threading.local()
+
+
+def _files_dict(filename, payload, mime):
+    """
+    Fill and return this thread's reusable multipart files mapping.
+    """
+    files = getattr(_FILES_LOCAL, "files", None)
+    if files is None:
+        files = {'file': [None, None, None]}
+        _FILES_LOCAL.files = files
+    field = files['file']
+    field[0] = filename
+    field[1] = payload
+    field[2] = mime
+    return files
+
+
+def _post_with_retries(send):
+    """
+    Call send() until it returns a non-retryable response, honoring
+    Retry-After and backing off exponentially between attempts. For
+    transports whose request bodies are single-use and therefore cannot
+    lean on adapter-level status retries; mirrors the aiohttp retry loop.
+
+    Args:
+        send: Zero-argument callable performing one upload attempt
+
+    Returns:
+        The final response
+    """
+    delay = _RETRY_BACKOFF
+    for attempt in range(_RETRY_TOTAL + 1):
+        response = send()
+        if response.status_code in _RETRY_STATUSES and attempt < _RETRY_TOTAL:
+            retry_after = response.headers.get("Retry-After", "")
+            wait = float(retry_after) if retry_after.isdigit() else delay
+            time.sleep(wait)
+            delay *= 2
+            continue
+        return response
+    return response
+
+
+def _post(url, filename, payload, mime):
+    """
+    Upload one encoded image to Cloudflare Images.
+
+    Args:
+        url: Cloudflare Images upload endpoint
+        filename: Display filename for the upload
+        payload: Encoded image bytes, or the path of a spill file
+        mime: MIME type matching the encoding
+
+    Returns:
+        The Cloudflare image ID on success, None otherwise
+    """
+    if _HTTPX_CLIENT is not None:
+        # httpx has no adapter-level status retries, so retry here,
+        # reopening the spill file per attempt; a consumed stream cannot
+        # be re-sent.
+        def send():
+            stream = open(payload, 'rb') if isinstance(payload, str) else None
+            try:
+                source = stream if stream is not None else payload
+                return _HTTPX_CLIENT.post(url, files={'file': (filename, source, mime)})
+            finally:
+                if stream is not None:
+                    stream.close()
+
+        response = _post_with_retries(send)
+    elif MultipartEncoder is not None:
+        # Stream the body straight from the encoded buffer (or spill file)
+        # so urllib3 never materializes a second full-payload copy. The
+        # encoder is single-use, so this goes through _STREAM_SESSION
+        # (connect-only adapter retries) and status retries happen here,
+        # rebuilding the encoder and its source per attempt.
+        def send():
+            stream = open(payload, 'rb') if isinstance(payload, str) else io.BytesIO(payload)
+            try:
+                body = MultipartEncoder(fields={'file': (filename, stream, mime)})
+                return _STREAM_SESSION.post(
+                    url, data=body, headers={'Content-Type': body.content_type})
+            finally:
+                stream.close()
+
+        response = _post_with_retries(send)
+    elif isinstance(payload, str):
+        with open(payload, 'rb') as stream:
+            response = _SESSION.post(url, files={'file': (filename, stream, mime)})
+    else:
+        response = _SESSION.post(url, files=_files_dict(filename, payload, mime))
+
+    if response.status_code == 200:
+        return _parse_result(_json_loads(response.content))
+    print(f"Upload failed with status {response.status_code}: {response.text}")
+    return None
+
+
+def _parse_result(result):
+    """
+    Extract the image ID from a parsed Cloudflare Images API response.
+
+    Args:
+        result: Decoded JSON response body
+
+    Returns:
+        The Cloudflare image ID on success, None otherwise
+    """
+    if result.get('success'):
+        image_id = result['result']['id']
+        print(f"Uploaded image to Cloudflare, ID: {image_id}")
+        return image_id
+    errors = result.get('errors', [{'message': 'Unknown error'}])
+    error_messages = [e.get('message', str(e)) for e in errors]
+    print(f"Error uploading to Cloudflare: {', '.join(error_messages)}")
+    return None
+
+
+@functools.lru_cache(maxsize=8)
+def _get_endpoint(account_id, api_token):
+    """
+    Build (and memoize) the upload URL and Authorization header value for
+    a credential pair. ComfyUI reuses the same credentials across many
+    executions, so this amortizes the string formatting over the life of
+    the process.
+    """
+    url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/images/v1"
+    auth = f"Bearer {api_token}"
+    return url, auth
+
+
+async def _upload_all(images, url, auth, filename_prefix, format="JPEG"):
+    """
+    Upload a whole batch over a single aiohttp session.
+
+    Encodes are pushed to executor threads so the event loop only ever
+    handles network I/O; the connector caps concurrency per host.
+
+    Args:
+        images: Tensor batch of images
+        url: Cloudflare Images upload endpoint
+        auth: Authorization header value
+        filename_prefix: Prefix for the display filenames
+        format: Output encoding, one of "PNG", "JPEG" or "WEBP"
+
+    Returns:
+        List of (index, image_id) pairs for the successful uploads
+    """
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(limit=32, limit_per_host=16)
+    headers = {"Authorization": auth}
+
+    # Bound in-flight uploads; as each one completes the next is admitted
+    # immediately rather than waiting on the rest of a batch.
+    sem = asyncio.Semaphore(16)
+
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+
+        async def upload(i):
+            async with sem:
+                filename, payload, mime = await loop.run_in_executor(
+                    None, _encode, i, images[i], filename_prefix, format)
+                try:
+                    delay = _RETRY_BACKOFF
+                    for attempt in range(_RETRY_TOTAL + 1):
+                        # FormData is single-use; rebuild it per attempt,
+                        # reopening the spill file for disk-backed payloads.
+                        stream = open(payload, 'rb') if isinstance(payload, str) else None
+                        try:
+                            form = aiohttp.FormData()
+                            form.add_field('file', stream if stream is not None else payload,
+                                           filename=filename, content_type=mime)
+                            async with session.post(url, data=form) as response:
+                                if response.status == 200:
+                                    return _parse_result(_json_loads(await response.read()))
+                                if response.status in _RETRY_STATUSES and attempt < _RETRY_TOTAL:
+                                    retry_after = response.headers.get("Retry-After", "")
+                                    wait = float(retry_after) if retry_after.isdigit() else delay
+                                    await asyncio.sleep(wait)
+                                    delay *= 2
+                                    continue
+                                print(f"Upload failed with status {response.status}: {await response.text()}")
+                                return None
+                        finally:
+                            if stream is not None:
+                                stream.close()
+                    return None
+                finally:
+                    _discharge_payload(payload)
+
+        outcomes = await asyncio.gather(
+            *(upload(i) for i in range(images.shape[0])), return_exceptions=True)
+
+    results = []
+    for i, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"Error uploading to Cloudflare: {str(outcome)}")
+        elif outcome is not None:
+            results.append((i, outcome))
+    return results
+
+
+def _upload_one(i, image, url, filename_prefix, format="JPEG"):
+    """
+    Encode a single image tensor and upload it to Cloudflare Images.
+
+    Args:
+        i: Index of the image within the batch
+        image: Image tensor slice from the batch
+        url: Cloudflare Images upload endpoint
+        filename_prefix: Prefix for the display filename
+        format: Output encoding, one of "PNG", "JPEG" or "WEBP"
+
+    Returns:
+        The Cloudflare image ID on success, None otherwise
+    """
+    filename, payload, mime = _encode(i, image, filename_prefix, format)
+    try:
+        return _post(url, filename, payload, mime)
+    finally:
+        _discharge_payload(payload)
+
+
+# Per-thread pinned staging buffers for CUDA->host copies. Copying into
+# pageable memory forces the driver through an extra internal staging copy;
+# a pinned destination gets the full PCIe transfer rate. Thread-local so
+# concurrent encodes never share a buffer.
+_PINNED_LOCAL = threading.local()
+
+
+def _pinned_staging(shape):
+    """
+    Return a pinned uint8 host tensor of the given shape, reusing (and
+    growing on demand) this thread's staging allocation.
+    """
+    numel = 1
+    for dim in shape:
+        numel *= dim
+    buf = getattr(_PINNED_LOCAL, "buf", None)
+    if buf is None or buf.numel() < numel:
+        buf = torch.empty(numel, dtype=torch.uint8, pin_memory=True)
+        _PINNED_LOCAL.buf = buf
+    return buf[:numel].view(shape)
+
+
 def tensor2pil(image):
     """
     Convert a PyTorch tensor to a PIL Image in memory.
@@ -112,9 +639,38 @@ def tensor2pil(image):
     Returns:
         PIL Image object
     """
-    # Convert tensor to numpy array (in memory)
-    i = 255. * image.cpu().numpy()
-    img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+    # Quantize to uint8 on whichever device the tensor lives on: a single
+    # fused clamp/scale/round/cast instead of three float intermediates.
+    # For CUDA inputs this runs on the GPU, so only one byte per channel
+    # crosses PCIe instead of four. CPU float32 images take the JIT kernel
+    # when numba is installed: one multicore pass over a zero-copy view of
+    # the tensor, straight into the output array.
+    if _quantize is not None and image.device.type == "cpu" \
+            and image.dim() == 3 and image.dtype == torch.float32:
+        src = image.detach().contiguous().numpy()
+        arr = np.empty(src.shape, dtype=np.uint8)
+        _quantize(src, arr)
+    else:
+        t = (image.clamp(0, 1) * 255).round().to(torch.uint8).contiguous()
+        if t.is_cuda:
+            # Land the copy in pinned memory so the DMA runs at full PCIe
+            # bandwidth, then synchronize before the CPU reads the pixels.
+            host = _pinned_staging(t.shape)
+            host.copy_(t, non_blocking=True)
+            torch.cuda.current_stream().synchronize()
+            t = host
+        arr = t.numpy()
+
+    # RGBA is one of Pillow's mappable raw modes, so frombuffer wraps the
+    # pixel buffer without copying; the image holds a reference to arr (and
+    # arr to the tensor), so the pixels stay valid for the image's lifetime
+    # and callers must not mutate the tensor until the encode is done. RGB
+    # is not mappable — frombuffer would silently copy via frombytes — so
+    # three-channel images go through fromarray like everything else.
+    if arr.ndim == 3 and arr.shape[2] == 4:
+        img = Image.frombuffer("RGBA", (arr.shape[1], arr.shape[0]), arr, "raw", "RGBA", 0, 1)
+    else:
+        img = Image.fromarray(arr)
     return img
 
 